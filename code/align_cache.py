@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import sqlite3
+from collections import OrderedDict
+
+# caches ativas (a última é a utilizada pelas classes de alinhamento)
+_active = []
+
+
+class AlignCache:
+	"""Cache de resultados de alinhamentos, indexada por uma hash dos parâmetros, com um nível LRU em memória e um nível opcional em disco (sqlite)."""
+
+	def __init__(self, maxsize = 1024, path = None, max_bytes = 256 * 2**20) -> None:
+
+		if type(maxsize) != int or type(max_bytes) != int:
+			raise TypeError("Os parâmetros 'maxsize' e 'max_bytes' devem ser do tipo 'int'.")
+
+		if maxsize < 0 or max_bytes < 0:
+			raise ValueError("Os valores dos parâmetros 'maxsize' e 'max_bytes' devem ser maiores ou iguais a 0.")
+
+		self.maxsize = maxsize
+		self.max_bytes = max_bytes
+		self.path = path
+		self.__memory = OrderedDict()
+		self.__stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+		self.__db = None
+		if path is not None:
+			self.__db = sqlite3.connect(path)
+			self.__db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, size INTEGER, atime INTEGER)")
+			self.__db.execute("CREATE INDEX IF NOT EXISTS cache_atime ON cache(atime)")
+			# tamanho total e relógio de acessos guardados no próprio ficheiro, que pode ser partilhado por vários processos
+			self.__db.execute("CREATE TABLE IF NOT EXISTS meta (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER, clock INTEGER)")
+			self.__db.execute("INSERT OR IGNORE INTO meta SELECT 0, COALESCE(SUM(size), 0), COALESCE(MAX(atime), 0) FROM cache")
+			self.__db.commit()
+
+
+	def __enter__(self) -> "AlignCache":
+		_active.append(self)
+		return self
+
+
+	def __exit__(self, *exc) -> None:
+		_active.remove(self)
+		self.close()
+
+
+	def close(self) -> None:
+		"""Grava e fecha o nível em disco."""
+		if self.__db is not None:
+			self.__db.commit()
+			self.__db.close()
+			self.__db = None
+
+
+	@staticmethod
+	def key(parts: tuple) -> str:
+		"""Devolve a hash (sha256) dos parâmetros que identificam um alinhamento."""
+		return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+
+	def stats(self) -> dict:
+		"""Devolve as estatísticas de acessos (hits em memória e em disco, misses, remoções) e a taxa de acerto."""
+		stats = dict(self.__stats)
+		total = stats["hits"] + stats["disk_hits"] + stats["misses"]
+		stats["hit_rate"] = (stats["hits"] + stats["disk_hits"]) / total if total else 0.0
+		stats["entries"] = len(self.__memory)
+		if self.__db is not None:
+			stats["disk_bytes"] = self.__db.execute("SELECT bytes FROM meta").fetchone()[0]
+		return stats
+
+
+	def __remember(self, key: str, value: str) -> None:
+		"""Insere um valor no nível em memória, removendo o menos usado recentemente se o limite for excedido."""
+		self.__memory[key] = value
+		self.__memory.move_to_end(key)
+		while len(self.__memory) > self.maxsize:
+			self.__memory.popitem(last = False)
+			self.__stats["evictions"] += 1
+
+
+	def __disk_get(self, key: str) -> str:
+		"""Procura um valor no nível em disco e atualiza o respetivo tempo de acesso."""
+		row = self.__db.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+		if row is None:
+			return None
+		self.__db.execute("UPDATE cache SET atime = ? WHERE key = ?", (self.__tick(), key))
+		return row[0]
+
+
+	def __tick(self) -> int:
+		"""Avança e devolve o relógio de acessos partilhado do nível em disco."""
+		self.__db.execute("UPDATE meta SET clock = clock + 1")
+		return self.__db.execute("SELECT clock FROM meta").fetchone()[0]
+
+
+	def __disk_put(self, key: str, value: str) -> None:
+		"""Grava um valor no nível em disco, removendo as entradas acedidas há mais tempo enquanto o tamanho exceder 'max_bytes'."""
+		size = len(value)
+		if size > self.max_bytes:
+			return
+		old = self.__db.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+		self.__db.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)", (key, value, size, self.__tick()))
+		self.__db.execute("UPDATE meta SET bytes = bytes + ?", (size - (old[0] if old else 0),))
+		disk_bytes = self.__db.execute("SELECT bytes FROM meta").fetchone()[0]
+		while disk_bytes > self.max_bytes:
+			victim, victim_size = self.__db.execute("SELECT key, size FROM cache ORDER BY atime LIMIT 1").fetchone()
+			self.__db.execute("DELETE FROM cache WHERE key = ?", (victim,))
+			self.__db.execute("UPDATE meta SET bytes = bytes - ?", (victim_size,))
+			disk_bytes -= victim_size
+			self.__stats["disk_evictions"] += 1
+
+
+	def get_or_compute(self, parts: tuple, compute):
+		"""Devolve o resultado guardado para 'parts' ou calcula-o com 'compute' e guarda-o (os resultados são tuplos ou escalares serializáveis em JSON)."""
+		key = AlignCache.key(parts)
+		value = self.__memory.get(key)
+		if value is not None:
+			self.__memory.move_to_end(key)
+			self.__stats["hits"] += 1
+		elif self.__db is not None and (value := self.__disk_get(key)) is not None:
+			self.__stats["disk_hits"] += 1
+			self.__remember(key, value)
+		else:
+			self.__stats["misses"] += 1
+			result = compute()
+			value = json.dumps(result)
+			self.__remember(key, value)
+			if self.__db is not None:
+				self.__disk_put(key, value)
+			return result
+		result = json.loads(value)
+		return tuple(result) if type(result) == list else result
+
+
+def lookup(parts: tuple, compute):
+	"""Devolve o resultado através da cache ativa, ou simplesmente calcula-o quando não existe nenhuma cache ativa."""
+	if not _active:
+		return compute()
+	return _active[-1].get_or_compute(parts, compute)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+from functools import lru_cache
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+DNA = "ACGT"
+PROTEIN = "ACDEFGHIKLMNPQRSTVWY"
+IUB = "ACGTRYMKSWBDHVN"
+
+
+@lru_cache(maxsize = None)
+def _code_table(alphabet: str) -> bytes:
+	"""Devolve a tabela de tradução que converte cada letra do alfabeto no seu índice (0, 1, 2, ...)."""
+	return bytes.maketrans(alphabet.encode("ascii"), bytes(range(len(alphabet))))
+
+
+def _check(seq: str, alphabet: str, message = None) -> str:
+	"""Valida a sequência em bloco (bytes.translate) e devolve-a em maiúsculas."""
+	upper = seq.upper()
+	if not seq.isascii() or upper.encode("ascii").translate(None, alphabet.encode("ascii")):
+		raise ValueError(message or f"A sequência contém caracteres que não pertencem ao alfabeto '{alphabet}'.")
+	return upper
+
+
+class EncodedSeq:
+	"""Sequência validada e codificada uma única vez, aceite diretamente pelas classes do pacote."""
+
+	def __init__(self, seq: str, alphabet = DNA, message = None) -> None:
+
+		if type(seq) != str:
+			raise TypeError("A sequência deve ser do tipo 'string'.")
+
+		self.seq = _check(seq, alphabet, message)
+		self.alphabet = alphabet
+		self.__codes = None
+
+
+	def __str__(self) -> str:
+		"""Devolve a sequência em maiúsculas."""
+		return self.seq
+
+
+	def __repr__(self) -> str:
+		"""Imprime o código utilizado aquando da criação da instância."""
+		return f'EncodedSeq(seq = "{self.seq}", alphabet = "{self.alphabet}")'
+
+
+	def __len__(self) -> int:
+		return len(self.seq)
+
+
+	@property
+	def codes(self) -> bytes:
+		"""Devolve (e guarda em cache) a sequência codificada como bytes com o índice de cada letra no alfabeto."""
+		if self.__codes is None:
+			self.__codes = self.seq.encode("ascii").translate(_code_table(self.alphabet))
+		return self.__codes
+
+
+	def array(self):
+		"""Devolve a sequência codificada como um array de NumPy (uint8), sem cópia."""
+		if np is None:
+			raise ImportError("O método 'array' requer o pacote 'numpy'.")
+		return np.frombuffer(self.codes, dtype = np.uint8)
+
+
+def encode(seq, alphabet = DNA, message = None) -> EncodedSeq:
+	"""Valida e codifica a sequência; instâncias de EncodedSeq com o mesmo alfabeto são devolvidas sem nova validação."""
+	if type(seq) == EncodedSeq:
+		if seq.alphabet == alphabet:
+			return seq
+		seq = seq.seq
+	return EncodedSeq(seq, alphabet, message)
+
+
+def text(seq) -> str:
+	"""Devolve a sequência em maiúsculas, quer seja uma string quer uma instância de EncodedSeq."""
+	return seq.seq if type(seq) == EncodedSeq else seq.upper()
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from class_align import Align
+from class_blast import Blast
+from class_dotplot import DotPlot
+from class_enzymes import Enzymes
+from class_motifs import Motifs
+from class_mult_align import MultipleAlign
+from class_seq import Seq
+from nw_glob_align import NeedlemanWunsch
+
+DNA = "ACGT"
+PROTEIN = "ACDEFGHIKLMNPQRSTVWY"
+
+
+def random_seq(rng: random.Random, n: int, alphabet = DNA) -> str:
+	"""Devolve uma sequência aleatória de tamanho n."""
+	return "".join(rng.choice(alphabet) for i in range(n))
+
+
+def mutate(rng: random.Random, seq: str, rate = 0.05, alphabet = DNA) -> str:
+	"""Devolve uma cópia da sequência com uma fração 'rate' de posições substituídas aleatoriamente."""
+	return "".join(rng.choice(alphabet) if rng.random() < rate else c for c in seq)
+
+
+def quiet(func):
+	"""Devolve uma versão da função que descarta tudo o que é impresso para o stdout."""
+	def wrapper():
+		with contextlib.redirect_stdout(io.StringIO()):
+			return func()
+	return wrapper
+
+
+class Benchmark:
+	"""Medição reprodutível do tempo de execução e da memória máxima dos métodos mais pesados de cada módulo."""
+
+	# nome do caso -> (tamanhos por defeito, função que recebe (rng, n) e devolve o callable a medir)
+	CASES = {
+		"align_global_dna": ([50,100,200],
+			lambda rng, n: Align(random_seq(rng, n), random_seq(rng, n), "global").align),
+		"align_local_dna": ([50,100,200],
+			lambda rng, n: Align(random_seq(rng, n), random_seq(rng, n), "local").align),
+		"align_global_blosum": ([10,20,40],
+			lambda rng, n: Align(random_seq(rng, n, PROTEIN), random_seq(rng, n, PROTEIN), "global", "blosum62").align),
+		"align_local_blosum": ([10,20,40],
+			lambda rng, n: Align(random_seq(rng, n, PROTEIN), random_seq(rng, n, PROTEIN), "local", "blosum62").align),
+		"nw_get_alignments": ([50,100,200],
+			lambda rng, n: NeedlemanWunsch(*(lambda s: (s, mutate(rng, s)))(random_seq(rng, n))).get_alignments),
+		"mult_align": ([25,50,100],
+			lambda rng, n: MultipleAlign((lambda s: [mutate(rng, s, 0.1) for i in range(4)])(random_seq(rng, n))).mult_align),
+		"blast_best_hit": ([200,400,800],
+			lambda rng, n: Blast(random_seq(rng, 50), random_seq(rng, n), 4).best_hit),
+		"motifs_seq_most": ([1000,2000,4000],
+			lambda rng, n: Motifs([random_seq(rng, 8) for i in range(10)], random_seq(rng, n), "pssm", 1).seq_most),
+		"enzymes_cut_positions": ([100000,200000,400000],
+			lambda rng, n: Enzymes(random_seq(rng, n), "G^AATTC").cut_positions),
+		"seq_get_all_prots": ([1000,2000,4000],
+			lambda rng, n: Seq(random_seq(rng, n)).get_all_prots),
+		"dotplot_wl": ([50,100,200],
+			lambda rng, n: quiet(DotPlot(random_seq(rng, n), random_seq(rng, n), 4, 3).dotplot_wl)),
+	}
+
+
+	def __init__(self, cases = None, scale = 1.0, repeat = 3, seed = 0) -> None:
+
+		if cases is None:
+			cases = list(Benchmark.CASES)
+
+		for case in cases:
+			if case not in Benchmark.CASES:
+				raise ValueError(f"O caso '{case}' não existe. Casos disponíveis: {', '.join(Benchmark.CASES)}.")
+
+		if type(repeat) != int or repeat < 1:
+			raise ValueError("O parâmetro 'repeat' deve ser um inteiro maior que 0.")
+
+		if scale <= 0:
+			raise ValueError("O parâmetro 'scale' deve ser maior que 0.")
+
+		self.cases = cases
+		self.scale = scale
+		self.repeat = repeat
+		self.seed = seed
+
+
+	def __sizes(self, case: str) -> list:
+		"""Devolve os tamanhos de input do caso, multiplicados pelo fator 'scale'."""
+		return [max(1, int(n * self.scale)) for n in Benchmark.CASES[case][0]]
+
+
+	def __measure(self, case: str, n: int) -> tuple:
+		"""Devolve o menor tempo (em segundos) de 'repeat' execuções, após uma execução de aquecimento, e a memória máxima alocada (em bytes) para o tamanho n."""
+		setup = Benchmark.CASES[case][1]
+		# execução de aquecimento, não medida (custos únicos, como a leitura das matrizes blosum)
+		setup(random.Random(f"{self.seed}-{case}-{n}"), n)()
+		times = []
+		for r in range(self.repeat):
+			func = setup(random.Random(f"{self.seed}-{case}-{n}"), n)
+			start = time.perf_counter()
+			func()
+			times.append(time.perf_counter() - start)
+		func = setup(random.Random(f"{self.seed}-{case}-{n}"), n)
+		tracemalloc.start()
+		func()
+		peak = tracemalloc.get_traced_memory()[1]
+		tracemalloc.stop()
+		return min(times), peak
+
+
+	@staticmethod
+	def exponent(sizes: list, times: list) -> float:
+		"""Devolve o expoente k de t ~ n^k, estimado por mínimos quadrados em escala log-log."""
+		points = [(math.log(n), math.log(t)) for n,t in zip(sizes, times) if n > 0 and t > 0]
+		if len(points) < 2:
+			return None
+		mx = sum(x for x,y in points) / len(points)
+		my = sum(y for x,y in points) / len(points)
+		sxx = sum((x - mx) ** 2 for x,y in points)
+		if sxx == 0:
+			return None
+		return sum((x - mx) * (y - my) for x,y in points) / sxx
+
+
+	def run(self, verbose = False) -> dict:
+		"""Executa todos os casos e devolve um dicionário com os tempos, a memória máxima e o expoente de escala de cada um."""
+		results = {}
+		for case in self.cases:
+			sizes = self.__sizes(case)
+			times, peaks = [], []
+			for n in sizes:
+				t, peak = self.__measure(case, n)
+				times.append(t)
+				peaks.append(peak)
+				if verbose:
+					print(f"{case:<24} n = {n:<8} {t * 1000:10.2f} ms {peak / 1024:10.1f} KiB", file = sys.stderr)
+			results[case] = {"sizes": sizes, "time": times, "peak_mem": peaks, "exponent": Benchmark.exponent(sizes, times)}
+		return {
+			"meta": {"python": platform.python_version(), "platform": platform.platform(),
+					 "seed": self.seed, "repeat": self.repeat, "scale": self.scale},
+			"results": results,
+		}
+
+
+	@staticmethod
+	def compare(old: dict, new: dict, threshold = 0.2) -> list:
+		"""Compara dois resultados e devolve a lista de regressões (caso, tamanho, rácio) cujo tempo aumentou mais que 'threshold'."""
+		regressions = []
+		for case,res in new["results"].items():
+			if case not in old["results"]:
+				continue
+			old_times = dict(zip(old["results"][case]["sizes"], old["results"][case]["time"]))
+			for n,t in zip(res["sizes"], res["time"]):
+				if n in old_times and old_times[n] > 0 and t / old_times[n] > 1 + threshold:
+					regressions.append((case, n, t / old_times[n]))
+		return regressions
+
+
+
+if __name__ == "__main__":
+
+	parser = argparse.ArgumentParser(description = "Benchmarks dos métodos principais do pacote.")
+	sub = parser.add_subparsers(dest = "command", required = True)
+
+	run = sub.add_parser("run", help = "executa os benchmarks e guarda os resultados em JSON")
+	run.add_argument("-o", "--output", default = "bench_results.json")
+	run.add_argument("--cases", nargs = "*", default = None, choices = list(Benchmark.CASES))
+	run.add_argument("--scale", type = float, default = 1.0)
+	run.add_argument("--repeat", type = int, default = 3)
+	run.add_argument("--seed", type = int, default = 0)
+
+	cmp = sub.add_parser("compare", help = "compara dois ficheiros de resultados")
+	cmp.add_argument("old")
+	cmp.add_argument("new")
+	cmp.add_argument("--threshold", type = float, default = 0.2)
+
+	args = parser.parse_args()
+
+	if args.command == "run":
+		output = os.path.abspath(args.output)
+		# os ficheiros blosum são lidos a partir da diretoria corrente
+		os.chdir(os.path.dirname(os.path.abspath(__file__)))
+		results = Benchmark(args.cases, args.scale, args.repeat, args.seed).run(verbose = True)
+		with open(output, "w") as file:
+			json.dump(results, file, indent = 2)
+		for case,res in results["results"].items():
+			exp = "-" if res["exponent"] is None else f"{res['exponent']:.2f}"
+			print(f"{case:<24} expoente de escala: {exp}")
+	else:
+		with open(args.old) as f_old, open(args.new) as f_new:
+			regressions = Benchmark.compare(json.load(f_old), json.load(f_new), args.threshold)
+		for case,n,ratio in regressions:
+			print(f"REGRESSÃO {case:<24} n = {n:<8} {ratio:.2f}x")
+		if not regressions:
+			print("Sem regressões acima do limiar.")
+		sys.exit(1 if regressions else 0)
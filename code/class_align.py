@@ -1,12 +1,75 @@
 
 # -*- coding: utf-8 -*-
 
+from align_cache import lookup
+from alphabet import EncodedSeq, text
+from instrument import enabled, mat_bytes, note, timed
+
+# matrizes blosum já lidas (nome -> dicionário de dicionários)
+_blosum = {}
+
+
+@timed("matrix_load", owner = "Align")
+def _read_blosum(name: str) -> dict:
+	"""Converte uma matriz blosum contida num ficheiro txt num dicionário de dicionários."""
+	with open(f"{name}.txt") as matrix:
+		headers,*mat = [linha.split() for linha in matrix.readlines() if linha.strip() != ""]
+	dic = {}
+	for lin in mat:
+		letra,*num = lin
+		dic[letra] = {}
+		for outra_letra,valor in zip(headers,num):
+			dic[letra][outra_letra] = valor
+	note(matrix = name)
+	return dic
+
+
+def load_blosum(name: str) -> dict:
+	"""Devolve a matriz blosum como dicionário de dicionários, lendo o ficheiro apenas na primeira utilização."""
+	if name not in _blosum:
+		_blosum[name] = _read_blosum(name)
+	return _blosum[name]
+
+
+def _myers(pattern: str, text: str, search = False):
+	"""Algoritmo bit-paralelo de Myers (variante de Hyyrö): devolve a distância de edição global entre as sequências ou, com 'search', a lista das distâncias mínimas do padrão terminando em cada posição do texto."""
+	m = len(pattern)
+	if m == 0:
+		return [0] * len(text) if search else len(text)
+	peq = {}
+	for i,c in enumerate(pattern):
+		peq[c] = peq.get(c, 0) | (1 << i)
+	full = (1 << m) - 1
+	last = 1 << (m - 1)
+	hin = 0 if search else 1
+	pv, mv, score = full, 0, m
+	scores = []
+	for c in text:
+		eq = peq.get(c, 0)
+		xv = eq | mv
+		xh = (((eq & pv) + pv) ^ pv) | eq
+		ph = mv | ~(xh | pv)
+		mh = pv & xh
+		if ph & last:
+			score += 1
+		elif mh & last:
+			score -= 1
+		ph = (ph << 1) | hin
+		mh = mh << 1
+		pv = (mh | ~(xv | ph)) & full
+		mv = ph & xv & full
+		if search:
+			scores.append(score)
+	return scores if search else score
+
+
 class Align:
 	"""Construção de alinhamentos locais (Smith-Waterman) e globais (Needleman-Wunsch)."""
 
+	@timed("validation")
 	def __init__(self, seq1: str, seq2: str, align_type = "global", scoring = [2,0], gap = 4) -> None:
 
-		if type(seq1) != str or type(seq2) != str:
+		if type(seq1) not in [str,EncodedSeq] or type(seq2) not in [str,EncodedSeq]:
 			raise TypeError("As sequências a alinhar devem ser do tipo 'string'.")
 
 		if align_type not in ["global","local"]:
@@ -24,8 +87,8 @@ class Align:
 			raise ValueError("O valor do parâmetro 'gap' não deve ser menor que 0.")
 
 
-		self.seq1 = seq1.upper()
-		self.seq2 = seq2.upper()
+		self.seq1 = text(seq1)
+		self.seq2 = text(seq2)
 		self.align_type = align_type
 		self.scoring = scoring
 		self.gap = gap
@@ -39,16 +102,7 @@ class Align:
 
 	def __build_dic(self) -> dict:
 		"""Converte uma matriz blosum contida num ficheiro txt num dicionário de dicionários."""
-		matrix = open(f"{self.scoring}.txt")
-		dic = {}
-		headers,*mat = [linha.split() for linha in matrix.readlines() if linha.strip() != ""]
-		matrix.close()
-		for lin in mat:
-			letra,*num = lin
-			dic[letra] = {}
-			for outra_letra,valor in zip(headers,num):
-				dic[letra][outra_letra] = valor
-		return dic
+		return load_blosum(self.scoring)
 
 
 	def __calc_score(self, x1: str, x2: str) -> int:
@@ -60,6 +114,7 @@ class Align:
 			return int(dic_blosum[x1][x2])
 
 
+	@timed("fill")
 	def __build_mats(self) -> list:
 		"""Recebe 2 sequências, um tipo de alinhamento e o valor da gap penalty, e retorna as matrizes de score e trace."""
 
@@ -90,9 +145,77 @@ class Align:
 				score_mat[i+1][j+1] = max(values)
 				trace_mat[i+1][j+1] = direc[values.index(max(values))]
 
+		if enabled():
+			note(cells = len(self.seq1) * len(self.seq2), bytes = mat_bytes(score_mat) + mat_bytes(trace_mat))
 		return score_mat,trace_mat
 
 
+	def __unit_cost(self) -> int:
+		"""Devolve o fator k tal que score = (k - gap)(n + m) - k * distância de edição, se o alinhamento global equivaler a distância de edição unitária, ou 0 caso contrário."""
+		if self.align_type != "global" or type(self.scoring) != list:
+			return 0
+		match, mismatch = self.scoring
+		k = mismatch + 2 * self.gap
+		return k if match == 2 * mismatch + 2 * self.gap and k > 0 else 0
+
+
+	@timed("bitparallel")
+	def edit_distance(self) -> int:
+		"""Devolve a distância de edição (custo unitário) entre as duas sequências, calculada com o algoritmo bit-paralelo de Myers."""
+		note(cells = len(self.seq1) * len(self.seq2))
+		return _myers(self.seq1, self.seq2)
+
+
+	def score(self) -> int:
+		"""Devolve apenas o score do alinhamento; para alinhamentos globais equivalentes a distância de edição não constrói qualquer matriz."""
+		k = self.__unit_cost()
+		if k:
+			return (k - self.gap) * (len(self.seq1) + len(self.seq2)) - k * self.edit_distance()
+		return self.align()[2]
+
+
+	@timed("search")
+	def search(self, k: int) -> list:
+		"""Procura ocorrências aproximadas de seq1 (read) em seq2 e devolve uma lista de tuplos (fim da ocorrência em seq2, distância de edição) com distância <= k."""
+		if type(k) != int:
+			raise TypeError("O parâmetro 'k' deve ser do tipo 'int'.")
+		if k < 0:
+			raise ValueError("O valor do parâmetro 'k' não deve ser menor que 0.")
+		hits = [(j + 1, d) for j,d in enumerate(_myers(self.seq1, self.seq2, search = True)) if d <= k]
+		note(cells = len(self.seq1) * len(self.seq2), hits = len(hits))
+		return hits
+
+
+	@timed("band_fill")
+	def __build_band_mats(self, band: int) -> list:
+		"""Constrói as matrizes de score e trace (linhas como dicionários) apenas para as células a distância <= 'band' da diagonal, onde se encontram todos os caminhos ótimos."""
+
+		nrows = len(self.seq1) + 1
+		ncols = len(self.seq2) + 1
+		score_mat = [{} for i in range(nrows)]
+		trace_mat = [{} for i in range(nrows)]
+		score_mat[0][0] = 0
+		trace_mat[0][0] = 0
+		for j in range(1,min(band + 1, ncols)):
+			score_mat[0][j] = score_mat[0][j-1] - self.gap
+			trace_mat[0][j] = "E"
+
+		low = float("-inf")
+		for i,x1 in enumerate(self.seq1):
+			prev_row, row, trace_row = score_mat[i], score_mat[i+1], trace_mat[i+1]
+			if i + 1 <= band:
+				row[0] = prev_row[0] - self.gap
+				trace_row[0] = "C"
+			for j in range(max(i + 1 - band, 1), min(i + 1 + band, ncols - 1) + 1):
+				values = [row.get(j-1, low) - self.gap, prev_row.get(j, low) - self.gap, prev_row[j-1] + self.__calc_score(x1,self.seq2[j-1])]
+				row[j] = max(values)
+				trace_row[j] = "ECD"[values.index(row[j])]
+
+		note(cells = sum(len(row) for row in score_mat))
+		return score_mat,trace_mat
+
+
+	@timed("max_score")
 	def __max_score(self) -> tuple:
 		"""Recebe uma matriz de score, e retorna o valor e os índices do score máximo na mesma."""
 		score_mat = self.__build_mats()[0]
@@ -108,12 +231,23 @@ class Align:
 		return score,i_max,j_max
 
 
+	@timed("align")
 	def align(self) -> tuple:
 		"""Recebe 2 sequências e um tipo de alinhamento, e retorna as sequências alinhadas e o score do alinhamento."""
+		return lookup(("Align", self.seq1, self.seq2, self.align_type, self.scoring, self.gap), self.__align)
+
+
+	def __align(self) -> tuple:
+		"""Constrói as matrizes e percorre a matriz de trace, devolvendo as sequências alinhadas e o score do alinhamento."""
 
 		nrows = len(self.seq1) + 1
 		ncols = len(self.seq2) + 1
-		score_mat,trace_mat = self.__build_mats()
+		# com custo unitário os caminhos ótimos ficam a distância <= d (distância de edição) da diagonal
+		band = self.edit_distance() if self.__unit_cost() else None
+		if band is not None and 2 * band + 1 < ncols:
+			score_mat,trace_mat = self.__build_band_mats(band)
+		else:
+			score_mat,trace_mat = self.__build_mats()
 		seq1_aligned = ""
 		seq2_aligned = ""
 
@@ -158,5 +292,6 @@ class Align:
 				else:
 					break
 
+		note(align_length = len(seq1_aligned))
 		return seq1_aligned,seq2_aligned,align_score
 
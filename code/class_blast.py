@@ -1,17 +1,21 @@
 
 # -*- coding: utf-8 -*-
 
+from alphabet import DNA, EncodedSeq, encode
+from instrument import note, timed
+
 class Blast:
 	"""Implementação de uma versão simplificada do algoritmo de BLAST."""
 
-	def __init__(self, query: str, seq: str, w: int) -> None:
+	@timed("validation")
+	def __init__(self, query: str, seq: str, w: int, index = None) -> None:
+		"""O parâmetro opcional 'index' é o resultado de 'Blast.subject_index(seq, w)', calculado previamente."""
 
-		if type(query) != str or type(seq) != str:
+		if type(query) not in [str,EncodedSeq] or type(seq) not in [str,EncodedSeq]:
 			raise TypeError("A query e a sequência devem ser do tipo 'string'.")
 
-		for c in query.upper() + seq.upper():
-			if c not in "ACTG":
-				raise ValueError("A query e a sequência devem corresponder a DNA.")
+		query = encode(query, DNA, "A query e a sequência devem corresponder a DNA.").seq
+		seq = encode(seq, DNA, "A query e a sequência devem corresponder a DNA.").seq
 
 		if type(w) != int:
 			raise TypeError("O parâmetro 'w' deve ser do tipo 'int'.")
@@ -19,9 +23,10 @@ class Blast:
 		if w < 2 or w > len(query):
 			raise ValueError("O valor do parâmetro 'w' deve situar-se no intervalo [2, len(query)].")
 
-		self.query = query.upper()
-		self.seq = seq.upper()
+		self.query = query
+		self.seq = seq
 		self.w = w
+		self.index = index
 
 
 	def __str__(self) -> str:
@@ -29,6 +34,7 @@ class Blast:
 		return f"Query: '{self.query}'\nSequência: '{self.seq}'\nHits: {self.hits()}\nBest hit: {self.best_hit()}"
 
 
+	@timed("query_map")
 	def __query_map(self) -> dict:
 		"""Recebe a sequência de query e o 'w', e devolve um dicionário cujas keys são sequências e os values são uma lista dos índices."""
 		subseq = [self.query[i:i+self.w] for i in range(len(self.query)) if i+self.w <= len(self.query)]
@@ -38,19 +44,30 @@ class Blast:
 				dic[s] = [i]
 			else:
 				dic[s].append(i)
+		note(words = len(dic))
+		return dic
+
+
+	@staticmethod
+	def subject_index(seq: str, w: int) -> dict:
+		"""Devolve um dicionário cujas keys são as palavras de tamanho w da sequência e os values são as listas dos respetivos índices (reutilizável entre queries)."""
+		dic = {}
+		for i in range(len(seq) - w + 1):
+			dic.setdefault(seq[i:i+w], []).append(i)
 		return dic
 
 
+	@timed("seeding")
 	def hits(self) -> list:
 		"""Recebe o dicionário criado no método '__query_map' e devolve uma lista de hits cujos elementos são tuplos de índices."""
-		subseq = [self.seq[i:i+self.w] for i in range(len(self.seq)) if i+self.w <= len(self.seq)]
+		index = self.index if self.index is not None else Blast.subject_index(self.seq, self.w)
 		qm = self.__query_map()
 		hits_list = []
 		for key in qm:
 			for item in qm[key]:
-				for i in range(len(subseq)):
-					if key == subseq[i]:
-						hits_list.append((item,i))
+				for i in index.get(key, []):
+					hits_list.append((item,i))
+		note(seeds = len(hits_list))
 		return hits_list
 
 
@@ -99,6 +116,7 @@ class Blast:
 		return sorted(lista, key = lambda x: (-x[3],x[2]))
 
 
+	@timed("best_hit")
 	def best_hit(self) -> tuple:
 		"""Recebe a query, a sequência e o 'w', e devolve o hit cuja extensão obteve maior score."""
 		q_map = self.__query_map()
@@ -110,5 +128,6 @@ class Blast:
 			for hit in hits_list:
 				extended_list.append(self.__extend_hit(hit))
 				extended_sorted = self.__sort_hits(extended_list)
+			note(extensions = len(extended_list))
 			return extended_sorted[0]
 
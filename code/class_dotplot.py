@@ -1,17 +1,73 @@
 
 # -*- coding: utf-8 -*-
 
+import mmap
+import os
+import struct
+import zlib
+from collections import Counter
+from itertools import accumulate
+from multiprocessing import Pool
+
+from alphabet import DNA, EncodedSeq, encode
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+
+def _map_file(path: str) -> memoryview:
+	"""Mapeia em memória um ficheiro contendo apenas uma sequência (sem cabeçalho nem quebras de linha)."""
+	with open(path, "rb") as file:
+		if file.seek(0, 2) == 0:
+			return memoryview(b"")
+		mm = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+	end = len(mm)
+	while end > 0 and mm[end-1:end].isspace():
+		end -= 1
+	return memoryview(mm)[:end]
+
+
+# sequências a comparar no processo corrente (carregadas por '_init_tile_worker')
+_tile_seqs = None
+
+
+def _init_tile_worker(src1: tuple, src2: tuple) -> None:
+	"""Carrega, em cada processo, as sequências a comparar (strings ou ficheiros mapeados em memória)."""
+	global _tile_seqs
+	_tile_seqs = tuple(_map_file(value) if kind == "file" else value for kind,value in (src1,src2))
+
+
+def _release_tile_worker() -> None:
+	"""Liberta as sequências carregadas por '_init_tile_worker' no processo corrente."""
+	global _tile_seqs
+	_tile_seqs = None
+
+
+def _tile_counts(task: tuple) -> Counter:
+	"""Calcula os pontos de um bloco do dotplot e agrega-os nas células correspondentes da grelha de densidade."""
+	r0, r1, c0, c1, w, l, shape, grid = task
+	k = max(w, 1)
+	blocks = []
+	for seq,start,stop in zip(_tile_seqs, (r0,c0), (r1,c1)):
+		block = seq[start:stop+k-1]
+		blocks.append(block if type(block) == str else bytes(block).decode("ascii").upper())
+	counts = Counter()
+	for i,j in DotPlot(blocks[0], blocks[1], w, l).dots():
+		counts[((r0+i) * grid[0] // shape[0], (c0+j) * grid[1] // shape[1])] += 1
+	return counts
+
 class DotPlot:
 	"""Construção de dotplots tendo em conta valores de 'window size' e 'stringency'."""
 
 	def __init__(self, seq1: str, seq2: str, w = 0, l = 0) -> None:
 
- 		if type(seq1) != str or type(seq2) != str:
+ 		if type(seq1) not in [str,EncodedSeq] or type(seq2) not in [str,EncodedSeq]:
  			raise TypeError("As sequências devem ser do tipo 'string'.")
 
- 		for c in seq1.upper() + seq2.upper():
- 			if c.upper() not in "ACTG":
- 				raise ValueError("Pelo menos uma das sequências inseridas não corresponde a DNA.")
+ 		encoded = tuple(encode(seq, DNA, "Pelo menos uma das sequências inseridas não corresponde a DNA.") for seq in (seq1,seq2))
+ 		seq1, seq2 = encoded[0].seq, encoded[1].seq
 
  		if type(w) != int or type(l) != int:
  			raise TypeError(f"Os parâmetros 'w' e 'l' devem ser do tipo 'int'.")
@@ -19,15 +75,43 @@ class DotPlot:
  		if w < 0 or l < 0:
  			raise ValueError(f"Os valores dos parâmetros 'w' e 'l' devem ser maiores ou iguais a 0.")
 
- 		self.seq1 = seq1.upper()
- 		self.seq2 = seq2.upper()
+ 		self.seq1 = seq1
+ 		self.seq2 = seq2
  		self.w = w
  		self.l = l
  		self.mat = []
+ 		self.paths = None
+ 		self.__lengths = (len(seq1), len(seq2))
+ 		self.__encoded = encoded
+
+
+	@classmethod
+	def from_files(cls, path1: str, path2: str, w = 0, l = 0) -> "DotPlot":
+		"""Cria uma instância a partir de dois ficheiros de sequência mapeados em memória; apenas o método 'density' está disponível nestas instâncias."""
+		dp = cls("", "", w, l)
+		lengths = []
+		for path in (path1, path2):
+			seq = _map_file(path)
+			for start in range(0, len(seq), 1 << 20):
+				if bytes(seq[start:start+(1 << 20)]).upper().translate(None, b"ACGT"):
+					raise ValueError("Pelo menos uma das sequências inseridas não corresponde a DNA.")
+			lengths.append(len(seq))
+			seq.release()
+		dp.paths = (path1, path2)
+		dp.__lengths = tuple(lengths)
+		return dp
+
+
+	def __in_memory(self, method: str) -> None:
+		"""Levanta um erro se a instância tiver sido criada a partir de ficheiros (as sequências não estão em memória)."""
+		if self.paths is not None:
+			raise ValueError(f"O método '{method}' não está disponível para instâncias criadas com 'from_files'; utilize o método 'density'.")
 
 
 	def __str__(self) -> str:
 		"""Imprime o código utilizado aquando da criação da instância."""
+		if self.paths is not None:
+			return f'DotPlot.from_files(path1 = "{self.paths[0]}", path2 = "{self.paths[1]}", w = {self.w}, l = {self.l})'
 		return f'DotPlot(seq1 = "{self.seq1}", seq2 = "{self.seq2}", w = {self.w}, l = {self.l})'
 
 
@@ -38,6 +122,7 @@ class DotPlot:
 
 	def dotplot(self) -> None:
 		"""Recebe 2 sequências e retorna uma matriz de pontos."""
+		self.__in_memory("dotplot")
 
 		if self.w != 0 or self.l != 0:
 			return "ERRO: Para valores de 'w' e 'l' diferentes de 0, por favor, utilize o método 'dotplot_wl'."
@@ -65,6 +150,7 @@ class DotPlot:
 
 	def dotplot_wl(self) -> None:
 		"""Recebe 2 sequências, uma window size (!=0) e um valor de stringency (!=0), e retorna uma matriz de pontos."""
+		self.__in_memory("dotplot_wl")
 
 		if self.w == 0 or self.l == 0:
 			return "ERRO: Para valores de 'w' e 'l' iguais a 0, por favor, utilize o método 'dotplot'."
@@ -97,3 +183,156 @@ class DotPlot:
 			
 			print("\n".join(lines))
 
+
+	def __shape(self) -> tuple:
+		"""Devolve o número de linhas e de colunas da matriz de pontos (uma por posição ou por janela)."""
+		k = max(self.w, 1)
+		return max(self.__lengths[0] - k + 1, 0), max(self.__lengths[1] - k + 1, 0)
+
+
+	def __kmer_dots(self, k: int) -> list:
+		"""Devolve as coordenadas das janelas de tamanho k idênticas em ambas as sequências (indexação de k-mers)."""
+		index = {}
+		for j in range(len(self.seq2) - k + 1):
+			index.setdefault(self.seq2[j:j+k], []).append(j)
+		dots = []
+		for i in range(len(self.seq1) - k + 1):
+			for j in index.get(self.seq1[i:i+k], ()):
+				dots.append((i,j))
+		return dots
+
+
+	def __diagonal_dots(self) -> list:
+		"""Devolve as coordenadas das janelas com pelo menos 'l' matches, usando somas cumulativas ao longo de cada diagonal."""
+		nrows, ncols = self.__shape()
+		dots = []
+		if np is not None:
+			seq1, seq2 = (enc.array() for enc in self.__encoded)
+			for d in range(-(nrows - 1), ncols):
+				i0, j0 = max(-d, 0), max(d, 0)
+				n = min(len(seq1) - i0, len(seq2) - j0)
+				cum = np.concatenate(([0], np.cumsum(seq1[i0:i0+n] == seq2[j0:j0+n])))
+				ks = np.flatnonzero(cum[self.w:] - cum[:-self.w] >= self.l)
+				dots.extend(zip((ks + i0).tolist(), (ks + j0).tolist()))
+			dots.sort()
+			return dots
+		codes1, codes2 = (enc.codes for enc in self.__encoded)
+		for d in range(-(nrows - 1), ncols):
+			i0, j0 = max(-d, 0), max(d, 0)
+			matches = [x1 == x2 for x1,x2 in zip(codes1[i0:], codes2[j0:])]
+			cum = [0] + list(accumulate(matches))
+			for k in range(len(matches) - self.w + 1):
+				if cum[k+self.w] - cum[k] >= self.l:
+					dots.append((i0+k,j0+k))
+		dots.sort()
+		return dots
+
+
+	def dots(self) -> list:
+		"""Devolve a lista esparsa de coordenadas (i, j) assinaladas no dotplot, ordenada por linha e coluna."""
+		self.__in_memory("dots")
+		if (self.w == 0) != (self.l == 0):
+			raise ValueError("Os parâmetros 'w' e 'l' devem ser ambos iguais a 0 ou ambos diferentes de 0.")
+		if self.w == 0 or self.l == self.w:
+			return sorted(self.__kmer_dots(max(self.w, 1)))
+		return self.__diagonal_dots()
+
+
+	def dense(self):
+		"""Devolve o dotplot como uma matriz booleana densa de NumPy (adequado apenas a sequências pequenas)."""
+		self.__in_memory("dense")
+		if np is None:
+			raise ImportError("O método 'dense' requer o pacote 'numpy'.")
+		mat = np.zeros(self.__shape(), dtype = bool)
+		dots = self.dots()
+		if dots:
+			rows, cols = zip(*dots)
+			mat[list(rows), list(cols)] = True
+		return mat
+
+
+	def __pixels(self) -> list:
+		"""Devolve as linhas da imagem do dotplot em tons de cinzento (0 para pontos, 255 para o fundo)."""
+		nrows, ncols = self.__shape()
+		rows = [bytearray(b"\xff" * ncols) for i in range(nrows)]
+		for i,j in self.dots():
+			rows[i][j] = 0
+		return rows
+
+
+	def save(self, path: str) -> None:
+		"""Escreve o dotplot num ficheiro PNG, PGM (imagem) ou NPY (array de coordenadas), consoante a extensão de 'path'."""
+		self.__in_memory("save")
+		ext = path.lower().rsplit(".", 1)[-1]
+		if ext not in ["png","pgm","npy"]:
+			raise ValueError("O ficheiro de output deve ter extensão '.png', '.pgm' ou '.npy'.")
+
+		if ext == "npy":
+			if np is None:
+				raise ImportError("A escrita de ficheiros '.npy' requer o pacote 'numpy'.")
+			np.save(path, np.array(self.dots(), dtype = np.int64).reshape(-1, 2))
+			return
+
+		nrows, ncols = self.__shape()
+		if nrows == 0 or ncols == 0:
+			raise ValueError("O dotplot está vazio (o valor de 'w' excede o tamanho de uma das sequências); não é possível gerar uma imagem.")
+		rows = self.__pixels()
+		with open(path, "wb") as file:
+			if ext == "pgm":
+				file.write(f"P5\n{ncols} {nrows}\n255\n".encode())
+				for row in rows:
+					file.write(row)
+			else:
+				def chunk(tag: bytes, data: bytes) -> bytes:
+					return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+				raw = b"".join(b"\x00" + bytes(row) for row in rows)
+				file.write(b"\x89PNG\r\n\x1a\n")
+				file.write(chunk(b"IHDR", struct.pack(">IIBBBBB", ncols, nrows, 8, 0, 0, 0, 0)))
+				file.write(chunk(b"IDAT", zlib.compress(raw)))
+				file.write(chunk(b"IEND", b""))
+
+
+	def density(self, resolution = 2000, tile = 2000, processes = None) -> list:
+		"""Divide o dotplot em blocos de 'tile' x 'tile' janelas, processa-os num conjunto de processos e devolve uma grelha de densidade de pontos (no máximo 'resolution' x 'resolution')."""
+
+		if type(resolution) != int or type(tile) != int:
+			raise TypeError("Os parâmetros 'resolution' e 'tile' devem ser do tipo 'int'.")
+
+		if resolution < 1 or tile < 1:
+			raise ValueError("Os valores dos parâmetros 'resolution' e 'tile' devem ser maiores que 0.")
+
+		if (self.w == 0) != (self.l == 0):
+			raise ValueError("Os parâmetros 'w' e 'l' devem ser ambos iguais a 0 ou ambos diferentes de 0.")
+
+		shape = self.__shape()
+		grid = (min(resolution, shape[0]), min(resolution, shape[1]))
+		mat = [[0 for j in range(grid[1])] for i in range(grid[0])]
+		tasks = ((r0, min(r0 + tile, shape[0]), c0, min(c0 + tile, shape[1]), self.w, self.l, shape, grid)
+				 for r0 in range(0, shape[0], tile) for c0 in range(0, shape[1], tile))
+
+		if self.paths is None:
+			srcs = (("str", self.seq1), ("str", self.seq2))
+		else:
+			srcs = (("file", self.paths[0]), ("file", self.paths[1]))
+
+		if processes == 1:
+			_init_tile_worker(*srcs)
+			try:
+				self.__add_counts(mat, map(_tile_counts, tasks))
+			finally:
+				_release_tile_worker()
+		else:
+			# vários blocos por envio, para que o custo de comunicação entre processos não domine
+			ntasks = -(-shape[0] // tile) * -(-shape[1] // tile)
+			chunksize = max(1, ntasks // (4 * (processes or os.cpu_count() or 1)))
+			with Pool(processes, initializer = _init_tile_worker, initargs = srcs) as pool:
+				self.__add_counts(mat, pool.imap_unordered(_tile_counts, tasks, chunksize))
+
+		return mat
+
+
+	def __add_counts(self, mat: list, results) -> None:
+		"""Soma à grelha de densidade as contagens devolvidas por cada bloco."""
+		for counts in results:
+			for (i,j),n in counts.items():
+				mat[i][j] += n
@@ -3,24 +3,18 @@
 
 import re
 
+from alphabet import DNA, IUB, EncodedSeq, encode
+
 class Enzymes:
 	"""Verificação dos locais de corte e dos fragmentos originados pela ação de uma enzima de restrição."""
 
 	def __init__(self, seq: str, enzyme: str) -> None:
 
-		if type(seq) != str or type(enzyme) != str:
+		if type(seq) not in [str,EncodedSeq] or type(enzyme) != str:
 			raise TypeError("Os parâmetros 'seq' e 'enzyme' devem ser do tipo 'string'.")
 
-		for c in seq.upper():
-			if c not in "ACTG":
-				raise ValueError("A sequência que inseriu não corresponde a DNA.")
-
-		for c in enzyme.upper():
-			if c not in "^ACTGRYMKSWBDHVN":
-				raise ValueError("Por favor, insira uma enzima de restrição válida.")
-
-		self.seq = seq.upper()
-		self.enzyme = enzyme.upper()
+		self.seq = encode(seq, DNA, "A sequência que inseriu não corresponde a DNA.").seq
+		self.enzyme = encode(enzyme, "^" + IUB, "Por favor, insira uma enzima de restrição válida.").seq
 
 
 	def __str__(self) -> str:
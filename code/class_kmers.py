@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+
+from alphabet import DNA, encode
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+class KmerCounts:
+	"""Contagem de k-mers de DNA com um hash rolante sobre a sequência codificada em 2 bits (array para k <= 12, dicionário para k > 12)."""
+
+	ARRAY_MAX_K = 12
+
+	def __init__(self, k: int) -> None:
+
+		if type(k) != int:
+			raise TypeError("O parâmetro 'k' deve ser do tipo 'int'.")
+
+		if k < 1:
+			raise ValueError("O valor do parâmetro 'k' deve ser maior que 0.")
+
+		self.k = k
+		self.total = 0
+		self.counts = array("Q", [0]) * 4 ** k if k <= KmerCounts.ARRAY_MAX_K else {}
+		self.__tail = b""
+
+
+	def __str__(self) -> str:
+		"""Imprime o código utilizado aquando da criação da instância e o número de k-mers contados."""
+		return f"KmerCounts(k = {self.k}) com {self.total} k-mers"
+
+
+	def __index(self, kmer: str) -> int:
+		"""Converte um k-mer no respetivo índice (2 bits por base)."""
+		h = 0
+		for c in encode(kmer, DNA, "O k-mer deve corresponder a DNA.").codes:
+			h = (h << 2) | c
+		return h
+
+
+	def __kmer(self, h: int) -> str:
+		"""Converte um índice no k-mer respetivo."""
+		return "".join(DNA[(h >> 2 * (self.k - 1 - p)) & 3] for p in range(self.k))
+
+
+	def __getitem__(self, kmer: str) -> int:
+		if len(kmer) != self.k:
+			raise ValueError(f"O k-mer deve ter tamanho {self.k}.")
+		h = self.__index(kmer)
+		return self.counts[h] if type(self.counts) == array else self.counts.get(h, 0)
+
+
+	def add(self, seq, stream = False) -> "KmerCounts":
+		"""Conta os k-mers de uma sequência (string, EncodedSeq ou Seq); com 'stream', a sequência é tratada como continuação da anterior, contando os k-mers que atravessam a fronteira."""
+		codes = encode(getattr(seq, "encoded", seq), DNA, "A sequência deve corresponder a DNA.").codes
+		if stream:
+			codes = self.__tail + codes
+			self.__tail = codes[max(len(codes) - self.k + 1, 0):]
+		else:
+			# uma sequência independente termina qualquer stream anterior
+			self.__tail = b""
+		n = len(codes) - self.k + 1
+		if n <= 0:
+			return self
+
+		if type(self.counts) == array and np is not None:
+			buf = np.frombuffer(codes, dtype = np.uint8).astype(np.int64)
+			idx = np.zeros(n, dtype = np.int64)
+			for p in range(self.k):
+				idx = (idx << 2) | buf[p:p+n]
+			view = np.frombuffer(self.counts, dtype = np.uint64)
+			if 16 * n < len(view):
+				# fragmentos pequenos face às 4^k posições: contar apenas os k-mers presentes
+				kmers, hist = np.unique(idx, return_counts = True)
+				view[kmers] += hist.astype(np.uint64)
+			else:
+				np.add(view, np.bincount(idx, minlength = len(view)), out = view, casting = "unsafe")
+		else:
+			mask = (1 << 2 * self.k) - 1
+			counts = self.counts
+			h = 0
+			for c in codes[:self.k-1]:
+				h = (h << 2) | c
+			if type(counts) == array:
+				for c in codes[self.k-1:]:
+					h = ((h << 2) | c) & mask
+					counts[h] += 1
+			else:
+				for c in codes[self.k-1:]:
+					h = ((h << 2) | c) & mask
+					counts[h] = counts.get(h, 0) + 1
+
+		self.total += n
+		return self
+
+
+	def merge(self, other: "KmerCounts") -> "KmerCounts":
+		"""Soma (no próprio objeto) as contagens de outro KmerCounts com o mesmo k, por exemplo calculadas por outro processo sobre outro fragmento do genoma (fragmentos sobrepostos em k - 1 bases)."""
+		if type(other) != KmerCounts:
+			raise TypeError("O parâmetro 'other' deve ser do tipo 'KmerCounts'.")
+		if other.k != self.k:
+			raise ValueError("Apenas é possível juntar contagens com o mesmo valor de 'k'.")
+		if type(self.counts) == array:
+			if np is not None:
+				np.frombuffer(self.counts, dtype = np.uint64)[:] += np.frombuffer(other.counts, dtype = np.uint64)
+			else:
+				self.counts = array("Q", map(sum, zip(self.counts, other.counts)))
+		else:
+			for h,n in other.counts.items():
+				self.counts[h] = self.counts.get(h, 0) + n
+		self.total += other.total
+		return self
+
+
+	def items(self) -> list:
+		"""Devolve a lista de tuplos (k-mer, contagem) dos k-mers presentes, por ordem lexicográfica."""
+		if type(self.counts) == array and np is not None:
+			counts = np.frombuffer(self.counts, dtype = np.uint64)
+			return [(self.__kmer(int(h)), int(counts[h])) for h in np.flatnonzero(counts)]
+		if type(self.counts) == array:
+			return [(self.__kmer(h), n) for h,n in enumerate(self.counts) if n]
+		return [(self.__kmer(h), self.counts[h]) for h in sorted(self.counts)]
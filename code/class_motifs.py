@@ -3,6 +3,8 @@
 
 import math
 
+from alphabet import DNA, EncodedSeq, encode
+
 class Motifs:
 	"""Determinação de motifs e perfis probabilísticos (PWM e PSSM)."""
 
@@ -11,7 +13,7 @@ class Motifs:
 		if type(alignment) != list:
 			raise TypeError("O alinhamento deve ser uma lista de strings.")
 
-		if type(seq) != str:
+		if type(seq) not in [str,EncodedSeq]:
 			raise TypeError("A sequência deve ser uma string.")
 
 		if type(profile) != str:
@@ -21,23 +23,17 @@ class Motifs:
 			raise TypeError("O parâmetro 'pseudocount' deverá ser do tipo 'int' ou 'float'.")
 
 		for item in alignment:
-			if type(item) != str:
+			if type(item) not in [str,EncodedSeq]:
 				raise TypeError("Os elementos da lista 'alignment' devem ser do tipo 'str'.") 
 
-		for item in alignment:
-			for c in item:
-				if c.upper() not in "ACTG":
-					raise ValueError("Pelo menos uma sequência do alinhamento não corresponde a DNA.")
-
-		for c in seq:
-			if c.upper() not in "ACTG":
-				raise ValueError("A sequência inserida não corresponde a DNA.")
+		alignment = [encode(item, DNA, "Pelo menos uma sequência do alinhamento não corresponde a DNA.").seq for item in alignment]
+		seq = encode(seq, DNA, "A sequência inserida não corresponde a DNA.").seq
 
 		if profile not in ["pwm","pssm"]:
 			raise ValueError("O parâmetro 'profile' apenas toma os valores 'pwm' ou 'pssm'.")
 
 		self.alignment = alignment
-		self.seq = seq.upper()
+		self.seq = seq
 		self.pseudocount = pseudocount
 		self.profile = profile
 
@@ -1,22 +1,24 @@
 
 # -*- coding: utf-8 -*-
 
+from align_cache import lookup
+from alphabet import DNA, EncodedSeq, encode
+from instrument import enabled, mat_bytes, note, timed
+
 class MultipleAlign:
 	"""Construção de alinhamentos múltiplos (alinhamento progressivo)."""
 
+	@timed("validation")
 	def __init__(self, seqs: list, scoring = [2,0], gap = 4) -> None:
 
 		if type(seqs) != list:
 			raise TypeError("As sequências a alinhar devem estar contidas numa lista.")
 
 		for seq in seqs:
-			if type(seq) != str:
+			if type(seq) not in [str,EncodedSeq]:
 				raise TypeError("As sequências que compõem o parâmetro 'seqs' devem ser do tipo 'str'.")
 
-		for seq in seqs:
-			for c in seq:
-				if c.upper() not in "ACTG":
-					raise ValueError("Pelo menos uma das sequências não corresponde a DNA.")
+		seqs = [encode(seq, DNA, "Pelo menos uma das sequências não corresponde a DNA.").seq for seq in seqs]
 
 		if type(scoring) != list:
 			raise TypeError("O parâmetro 'scoring' deve ser do tipo 'list'.")
@@ -30,9 +32,7 @@ class MultipleAlign:
 		if gap < 0:
 			raise ValueError("O valor do parâmetro 'gap' não deve ser menor que 0.")
 
-		self.seqs = []
-		for seq in seqs:
-			self.seqs.append(seq.upper())
+		self.seqs = seqs
 		self.scoring = scoring
 		self.gap = gap
 
@@ -48,6 +48,7 @@ class MultipleAlign:
 		return self.scoring[0] if x1 == x2 else self.scoring[1]
 
 
+	@timed("fill")
 	def __build_mats(self, seq1: str, seq2: str) -> list:
 		"""Recebe 2 sequências e o valor da gap penalty, e retorna as matrizes de score e trace."""
 
@@ -70,11 +71,19 @@ class MultipleAlign:
 				score_mat[i+1][j+1] = max(values)
 				trace_mat[i+1][j+1] = direc[values.index(max(values))]
 
+		if enabled():
+			note(cells = len(seq1) * len(seq2), bytes = mat_bytes(score_mat) + mat_bytes(trace_mat))
 		return score_mat,trace_mat
 
 
+	@timed("pairwise")
 	def __align(self, seq1: str, seq2: str) -> tuple:
 		"""Recebe 2 sequências e retorna o alinhamento das mesmas (Needleman–Wunsch)."""
+		return lookup(("MultipleAlign", seq1, seq2, self.scoring, self.gap), lambda: self.__pairwise(seq1, seq2))
+
+
+	def __pairwise(self, seq1: str, seq2: str) -> tuple:
+		"""Constrói as matrizes das 2 sequências e percorre a matriz de trace, devolvendo o score e as sequências alinhadas."""
 		nrows = len(seq1) + 1
 		ncols = len(seq2) + 1
 		score_mat,trace_mat = self.__build_mats(seq1, seq2)
@@ -107,6 +116,7 @@ class MultipleAlign:
 		return "".join(x1 if x1 != "-" else x2 for x1,x2 in zip(seq1,seq2))
 
 
+	@timed("mult_align")
 	def mult_align(self) -> list:
 		"""Recebe uma lista de sequências e retorna uma lista com as sequências alinhadas."""
 		seq1, seq2, *resto = self.seqs
@@ -121,5 +131,6 @@ class MultipleAlign:
 		for seq in self.seqs:
 			score, aligned1, aligned2 = self.__align(consenso,seq)
 			alignment.append(aligned2)
+		note(pairwise = len(resto) + 1 + len(self.seqs))
 		return alignment
 
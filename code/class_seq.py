@@ -1,19 +1,24 @@
 
 # -*- coding: utf-8 -*-
 
+from alphabet import DNA, EncodedSeq, encode
+from class_kmers import KmerCounts
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
 class Seq:
 	"""Implementação de métodos básicos para a análise de sequências de DNA."""
 
 	def __init__(self, seq: str) -> None:
 
-		if type(seq) != str:
+		if type(seq) not in [str,EncodedSeq]:
 			raise TypeError("A sequência deve ser do tipo 'string'.")
 
-		for c in seq:
-			if c.upper() not in "ACTG":
-				raise ValueError("A sequência que inseriu não corresponde a DNA.")
-
-		self.seq = seq.upper()
+		self.encoded = encode(seq, DNA, "A sequência que inseriu não corresponde a DNA.")
+		self.seq = self.encoded.seq
 
 
 	def __str__(self) -> str:
@@ -77,3 +82,52 @@ class Seq:
 			all_prots.append(prots)
 		return [prots for nested_prots in all_prots for prots in nested_prots]
 
+
+	def kmer_counts(self, k: int) -> KmerCounts:
+		"""Devolve as contagens de todos os k-mers da sequência."""
+		return KmerCounts(k).add(self.encoded)
+
+
+	def codon_usage(self) -> dict:
+		"""Devolve um dicionário com o número de ocorrências de cada codão (grelha de leitura corrente)."""
+		usage = {}
+		for codon in self.get_codons():
+			usage[codon] = usage.get(codon, 0) + 1
+		return usage
+
+
+	def gc_content(self) -> float:
+		"""Devolve a fração de bases G e C na sequência."""
+		return (self.seq.count("G") + self.seq.count("C")) / len(self.seq) if self.seq else 0.0
+
+
+	def gc_windows(self, w: int, step = 1) -> list:
+		"""Devolve, para cada janela de tamanho w (de 'step' em 'step' bases), um tuplo (início, conteúdo GC, GC skew = (G - C) / (G + C)); com NumPy, calculados numa única passagem com somas cumulativas."""
+
+		if type(w) != int or type(step) != int:
+			raise TypeError("Os parâmetros 'w' e 'step' devem ser do tipo 'int'.")
+
+		if w < 1 or step < 1:
+			raise ValueError("Os valores dos parâmetros 'w' e 'step' devem ser maiores que 0.")
+
+		codes = self.encoded.codes
+		# códigos: A = 0, C = 1, G = 2, T = 3
+		if np is not None:
+			arr = self.encoded.array()
+			dtype = np.int32 if len(codes) < 2**31 else np.int64
+			g = np.zeros(len(codes) + 1, dtype = dtype)
+			c = np.zeros(len(codes) + 1, dtype = dtype)
+			np.cumsum(arr == 2, out = g[1:])
+			np.cumsum(arr == 1, out = c[1:])
+			starts = np.arange(0, len(codes) - w + 1, step)
+			ng = g[starts + w] - g[starts]
+			nc = c[starts + w] - c[starts]
+			skew = np.where(ng + nc > 0, (ng - nc) / np.maximum(ng + nc, 1), 0.0)
+			return list(zip(starts.tolist(), ((ng + nc) / w).tolist(), skew.tolist()))
+
+		windows = []
+		for start in range(0, len(codes) - w + 1, step):
+			ng = codes.count(2, start, start + w)
+			nc = codes.count(1, start, start + w)
+			windows.append((start, (ng + nc) / w, (ng - nc) / (ng + nc) if ng + nc else 0.0))
+		return windows
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+import atexit
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# instrumentos ativos no contexto corrente (o último é o que recebe os registos) e registos das fases em curso;
+# cada thread (e cada tarefa asyncio) tem as suas próprias pilhas
+_active = contextvars.ContextVar("instrument_active", default = ())
+_open = contextvars.ContextVar("instrument_open", default = ())
+
+# instrumento de todo o processo (AASB_INSTRUMENT), usado quando o contexto corrente não tem nenhum ativo
+_default = None
+
+
+class Instrument:
+	"""Recolha opcional de métricas por fase (tempos, células calculadas, seeds, extensões, memória alocada) das classes de alinhamento; com 'path', os registos são escritos em ficheiro (JSON Lines) à medida que cada fase termina, em vez de ficarem em memória."""
+
+	def __init__(self, job = None, path = None) -> None:
+		self.job = job
+		self.path = path
+		self.records = []
+		self.__pid = os.getpid()
+		self.__file = None
+		self.__file_pid = None
+		self.__written = set()
+		self.__lock = threading.Lock()
+		self.__tokens = []
+
+
+	def __enter__(self) -> "Instrument":
+		self.__tokens.append(_active.set(_active.get() + (self,)))
+		return self
+
+
+	def __exit__(self, *exc) -> None:
+		_active.reset(self.__tokens.pop())
+		self.close()
+
+
+	def summary(self) -> list:
+		"""Agrega os registos por (classe, fase), somando o número de chamadas, os tempos e os contadores numéricos."""
+		groups = {}
+		for rec in self.records:
+			key = (rec["class"], rec["phase"])
+			agg = groups.setdefault(key, {"job": self.job, "class": key[0], "phase": key[1], "calls": 0})
+			agg["calls"] += 1
+			for k,v in rec.items():
+				if k not in ["job","class","phase","parent"] and type(v) in [int,float]:
+					agg[k] = agg.get(k, 0) + v
+		return list(groups.values())
+
+
+	def export(self, path: str) -> None:
+		"""Escreve os registos num ficheiro JSON Lines (um registo por linha)."""
+		with open(path, "w") as file:
+			for rec in self.records:
+				file.write(json.dumps(rec) + "\n")
+
+
+	def record(self, rec: dict) -> None:
+		"""Guarda o registo de uma fase terminada, em memória ou (com 'path') no ficheiro do processo corrente."""
+		if self.path is None:
+			self.records.append(rec)
+			return
+		with self.__lock:
+			pid = os.getpid()
+			if self.__file_pid != pid:
+				# num processo filho, o ficheiro herdado pertence ao processo pai
+				path = self.path if pid == self.__pid else f"{self.path}.{pid}"
+				self.__file = open(path, "a" if pid in self.__written else "w")
+				self.__file_pid = pid
+				self.__written.add(pid)
+			self.__file.write(json.dumps(rec) + "\n")
+			# escrita imediata: os processos de trabalho terminam sem executar 'atexit'
+			self.__file.flush()
+
+
+	def close(self) -> None:
+		"""Fecha o ficheiro de registos do processo corrente (quando existe)."""
+		with self.__lock:
+			if self.__file is not None and self.__file_pid == os.getpid():
+				self.__file.close()
+				self.__file = None
+				self.__file_pid = None
+
+
+def _current():
+	"""Devolve o instrumento que recebe os registos no contexto corrente (ou None)."""
+	active = _active.get()
+	return active[-1] if active else _default
+
+
+def enabled() -> bool:
+	"""Indica se existe algum instrumento ativo."""
+	return _current() is not None
+
+
+def timed(phase: str, owner = None):
+	"""Decorador que regista a duração de cada chamada do método como uma fase, apenas quando existe um instrumento ativo ('owner' substitui o nome da classe, para funções de módulo)."""
+	def decorator(method):
+		name = owner or method.__qualname__.split(".")[0]
+
+		@functools.wraps(method)
+		def wrapper(*args, **kwargs):
+			inst = _current()
+			if inst is None:
+				return method(*args, **kwargs)
+			stack = _open.get()
+			rec = {"job": inst.job, "class": name, "phase": phase, "parent": stack[-1]["phase"] if stack else None}
+			rec["children"] = 0
+			token = _open.set(stack + (rec,))
+			start = time.perf_counter()
+			try:
+				return method(*args, **kwargs)
+			finally:
+				rec["seconds"] = time.perf_counter() - start
+				children = rec.pop("children")
+				rec["self_seconds"] = rec["seconds"] - children
+				_open.reset(token)
+				if stack:
+					stack[-1]["children"] += rec["seconds"]
+				inst.record(rec)
+		return wrapper
+	return decorator
+
+
+def note(**fields) -> None:
+	"""Acrescenta contadores ao registo da fase em curso (os valores numéricos são somados aos já existentes)."""
+	stack = _open.get()
+	if not stack:
+		return
+	rec = stack[-1]
+	for k,v in fields.items():
+		if k in rec and type(v) in [int,float]:
+			rec[k] += v
+		else:
+			rec[k] = v
+
+
+def mat_bytes(mat: list) -> int:
+	"""Devolve uma estimativa do número de bytes ocupados por uma matriz (lista de listas), sem contar os elementos partilhados."""
+	return sys.getsizeof(mat) + sum(sys.getsizeof(row) for row in mat)
+
+
+# AASB_INSTRUMENT=<ficheiro> ativa a instrumentação para todo o processo; os registos são escritos à medida que cada
+# fase termina, no ficheiro indicado pelo processo que o definiu e em '<ficheiro>.<pid>' pelos processos filhos (fork ou spawn)
+if os.environ.get("AASB_INSTRUMENT"):
+	_env_path = os.environ["AASB_INSTRUMENT"]
+	if int(os.environ.setdefault("AASB_INSTRUMENT_PID", str(os.getpid()))) != os.getpid():
+		_env_path = f"{_env_path}.{os.getpid()}"
+	_default = Instrument(job = os.environ.get("AASB_JOB"), path = _env_path)
+	atexit.register(_default.close)
@@ -1,3 +1,5 @@
+from align_cache import lookup
+from instrument import enabled, mat_bytes, note, timed
 
 class NeedlemanWunsch:
 
@@ -5,6 +7,7 @@ class NeedlemanWunsch:
 	Implementa o algoritmo de Needleman-Wunsch para o alinhamento global de sequências biológicas
 	"""
 
+	@timed("init")
 	def __init__(self, s1, s2, gap = -1, mol_type = "dna"):
 
 		"""
@@ -19,10 +22,12 @@ class NeedlemanWunsch:
 		elif mol_type == "protein":
 			blosum_dic = NeedlemanWunsch.__get_blosum_dic("blosum62.txt")
 			self.scoring = lambda x1, x2: blosum_dic[x1][x2]
-		self.trace_mat, self.score_mat = self.__get_mats()
+		# as matrizes apenas são construídas na primeira chamada a 'get_alignments'
+		self.trace_mat, self.score_mat = None, None
 
 
 	@staticmethod
+	@timed("matrix_load")
 	def __get_blosum_dic(file):
 
 		"""
@@ -43,6 +48,7 @@ class NeedlemanWunsch:
 		return blosum_dic
 
 
+	@timed("fill")
 	def __get_mats(self):
 
 		"""
@@ -59,23 +65,59 @@ class NeedlemanWunsch:
 
 		for j in range(1, n + 1):
 			trace_mat[0][j] = "E"
-			score_mat[0][j] = self.gap * i
+			score_mat[0][j] = self.gap * j
 
-		direc = "ECD"
 		for i in range(1, m + 1):
+			x1 = self.s1[i-1]
+			prev_row, row, trace_row = score_mat[i-1], score_mat[i], trace_mat[i]
 			for j in range(1, n + 1):
-				temp = [
-						score_mat[i][j-1] + self.gap, 
-						score_mat[i-1][j] + self.gap, 
-						score_mat[i-1][j-1] + self.scoring(self.s1[i-1], self.s2[j-1])
-					   ]
-				score_mat[i][j] = max(temp)
-				indices = [i for i in range(len(temp)) if temp[i] == max(temp)]
-				trace_mat[i][j] = "".join([direc[i] for i in indices])
-
+				e = row[j-1] + self.gap
+				c = prev_row[j] + self.gap
+				d = prev_row[j-1] + self.scoring(x1, self.s2[j-1])
+				best = max(e, c, d)
+				row[j] = best
+				trace_row[j] = ("E" if e == best else "") + ("C" if c == best else "") + ("D" if d == best else "")
+
+		if enabled():
+			note(cells = m * n, bytes = mat_bytes(trace_mat) + mat_bytes(score_mat))
 		return trace_mat, score_mat
 
 
+	@timed("score")
+	def score(self):
+
+		"""
+		Retorna apenas o score do alinhamento global, mantendo em memória somente duas linhas da matriz de score
+		"""
+
+		if self.score_mat is not None: return self.score_mat[-1][-1]
+		return lookup(("NeedlemanWunsch.score", self.s1, self.s2, self.gap, self.mol_type), self.__score_rows)
+
+
+	def __score_rows(self):
+
+		"""
+		Calcula o score do alinhamento global linha a linha
+		"""
+
+		n = len(self.s2)
+		prev_row = [self.gap * j for j in range(n + 1)]
+		for i in range(1, len(self.s1) + 1):
+			x1 = self.s1[i-1]
+			row = [self.gap * i] + [0] * n
+			for j in range(1, n + 1):
+				row[j] = max(
+							row[j-1] + self.gap,
+							prev_row[j] + self.gap,
+							prev_row[j-1] + self.scoring(x1, self.s2[j-1])
+						 )
+			prev_row = row
+
+		if enabled():
+			note(cells = len(self.s1) * n, bytes = 2 * mat_bytes([prev_row]))
+		return prev_row[-1]
+
+
 	def __get_unproc_aligns(self, i, j):
 
 		"""
@@ -102,12 +144,25 @@ class NeedlemanWunsch:
 		return problem
 
 
+	@timed("get_alignments")
 	def get_alignments(self):
 
 		"""
 		Retorna os melhores alinhamentos de sequências e o respetivo score
 		"""
 
+		return lookup(("NeedlemanWunsch", self.s1, self.s2, self.gap, self.mol_type), self.__traceback)
+
+
+	def __traceback(self):
+
+		"""
+		Constrói as matrizes (se necessário) e percorre a matriz de trace, devolvendo os alinhamentos e o score
+		"""
+
+		if self.trace_mat is None:
+			self.trace_mat, self.score_mat = self.__get_mats()
+
 		m, n = len(self.s1), len(self.s2)
 		unproc_aligns = self.__get_unproc_aligns(m, n)
 
@@ -117,6 +172,7 @@ class NeedlemanWunsch:
 			s2 = "".join([c[1] for c in align])
 			alignments += [[s1, s2]]
 
+		note(alignments = len(alignments))
 		return alignments, self.score_mat[-1][-1]
 
 
@@ -125,6 +181,7 @@ if __name__ == "__main__":
 
 	nw_dna = NeedlemanWunsch("ATGAAGGT", "AGAGAGGC", mol_type = "dna")
 	print(nw_dna.get_alignments())
+	print(nw_dna.score())
 
 	nw_protein = NeedlemanWunsch("GKYESVI", "KYVSSWI", mol_type = "protein")
 	print(nw_protein.get_alignments())
@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from alphabet import DNA, encode
+from class_align import Align, load_blosum
+from class_blast import Blast
+from class_motifs import Motifs
+
+# estado de cada processo de trabalho: sujeitos registados e respetivos índices por 'w'
+_subjects = {}
+_indexes = {}
+
+
+def _init_worker(subjects: dict, blosums: list) -> None:
+	"""Carrega, em cada processo de trabalho, as sequências sujeito e as matrizes blosum, que ficam em memória entre pedidos."""
+	_subjects.clear()
+	# codificadas uma única vez: 'Blast' aceita a EncodedSeq sem voltar a validar o sujeito em cada pedido
+	_subjects.update({name: encode(seq, DNA) for name,seq in subjects.items()})
+	_indexes.clear()
+	for name in blosums:
+		# sem o ficheiro na diretoria corrente, o erro surge apenas nos pedidos que usam a matriz
+		try:
+			load_blosum(name)
+		except FileNotFoundError:
+			pass
+
+
+def _blast(args: dict):
+	"""Executa um pedido 'blast', contra uma sequência sujeito registada ('subject') ou enviada no pedido ('seq')."""
+	w = args["w"]
+	if "subject" in args:
+		name = args["subject"]
+		if name not in _subjects:
+			raise ValueError(f"A sequência sujeito '{name}' não está registada.")
+		seq = _subjects[name]
+		if (name, w) not in _indexes:
+			_indexes[(name, w)] = Blast.subject_index(seq.seq, w)
+		return Blast(args["query"], seq, w, _indexes[(name, w)]).best_hit()
+	return Blast(args["query"], args["seq"], w).best_hit()
+
+
+# operação -> função que recebe os argumentos do pedido e devolve o resultado
+OPS = {
+	"align": lambda args: Align(args["seq1"], args["seq2"], args.get("align_type", "global"),
+								args.get("scoring", [2,0]), args.get("gap", 4)).align(),
+	"score": lambda args: Align(args["seq1"], args["seq2"], args.get("align_type", "global"),
+								args.get("scoring", [2,0]), args.get("gap", 4)).score(),
+	"blast": _blast,
+	"motifs": lambda args: Motifs(args["alignment"], args["seq"], args.get("profile", "pssm"),
+								  args.get("pseudocount", 1)).seq_most(),
+}
+
+
+def _run_batch(jobs: list) -> list:
+	"""Executa um lote de pedidos (operação, argumentos) e devolve, para cada um, um tuplo (sucesso, resultado ou mensagem de erro)."""
+	results = []
+	for op,args in jobs:
+		try:
+			results.append((True, OPS[op](args)))
+		except Exception as err:
+			results.append((False, f"{type(err).__name__}: {err}"))
+	return results
+
+
+class AlignService:
+	"""Serviço local (asyncio) que mantém matrizes blosum e índices de sequências sujeito em memória e agrupa pedidos concorrentes em lotes executados num conjunto de processos."""
+
+	def __init__(self, subjects = None, processes = None, max_queue = 256, batch_size = 16, batch_delay = 0.002) -> None:
+
+		if subjects is not None and type(subjects) != dict:
+			raise TypeError("O parâmetro 'subjects' deve ser um dicionário (nome -> sequência).")
+
+		if type(max_queue) != int or type(batch_size) != int:
+			raise TypeError("Os parâmetros 'max_queue' e 'batch_size' devem ser do tipo 'int'.")
+
+		if max_queue < 1 or batch_size < 1:
+			raise ValueError("Os valores dos parâmetros 'max_queue' e 'batch_size' devem ser maiores que 0.")
+
+		if processes is not None and (type(processes) != int or processes < 0):
+			raise ValueError("O parâmetro 'processes' deve ser um inteiro maior ou igual a 0 (0 executa os pedidos no próprio processo).")
+
+		self.subjects = {name: encode(seq, DNA, f"A sequência sujeito '{name}' não corresponde a DNA.").seq
+						 for name,seq in (subjects or {}).items()}
+		self.processes = processes
+		self.max_queue = max_queue
+		self.batch_size = batch_size
+		self.batch_delay = batch_delay
+		self.latencies = deque(maxlen = 10000)
+		self.__counts = {"requests": 0, "errors": 0, "batches": 0}
+		self.__queue = None
+		self.__executor = None
+		self.__batcher = None
+		self.__inflight = None
+		self.__pending = set()
+		self.__closed = False
+
+
+	async def __aenter__(self) -> "AlignService":
+		await self.start()
+		return self
+
+
+	async def __aexit__(self, *exc) -> None:
+		await self.close()
+
+
+	async def start(self) -> None:
+		"""Inicia o conjunto de processos (ou uma thread, com processes = 0) e a tarefa que agrupa os pedidos em lotes."""
+		initargs = (self.subjects, ["blosum50","blosum62","blosum80"])
+		if self.processes == 0:
+			self.__executor = ThreadPoolExecutor(1, initializer = _init_worker, initargs = initargs)
+			workers = 1
+		else:
+			self.__executor = ProcessPoolExecutor(self.processes, initializer = _init_worker, initargs = initargs)
+			workers = self.processes or os.cpu_count() or 1
+		self.__queue = asyncio.Queue(self.max_queue)
+		self.__inflight = asyncio.Semaphore(2 * workers)
+		self.__batcher = asyncio.get_running_loop().create_task(self.__batch_loop())
+
+
+	async def close(self) -> None:
+		"""Deixa de aceitar pedidos, faz falhar (RuntimeError) os pedidos ainda por executar, espera pelos lotes em curso e encerra os processos."""
+		self.__closed = True
+		if self.__batcher is not None:
+			self.__batcher.cancel()
+			try:
+				await self.__batcher
+			except asyncio.CancelledError:
+				pass
+			self.__batcher = None
+		if self.__queue is not None:
+			self.__drain()
+		if self.__pending:
+			await asyncio.gather(*self.__pending)
+		if self.__executor is not None:
+			self.__executor.shutdown()
+			self.__executor = None
+
+
+	async def enqueue(self, op: str, args: dict) -> asyncio.Future:
+		"""Coloca um pedido na fila (esperando enquanto a fila estiver cheia) e devolve o future com o respetivo resultado."""
+		if self.__closed:
+			raise RuntimeError("O serviço foi encerrado.")
+		if self.__queue is None:
+			raise RuntimeError("O serviço ainda não foi iniciado (utilize 'start' ou 'async with').")
+		if op not in OPS:
+			raise ValueError(f"A operação '{op}' não existe. Operações disponíveis: {', '.join(OPS)}.")
+		future = asyncio.get_running_loop().create_future()
+		await self.__queue.put((op, args, future, time.perf_counter()))
+		# o serviço pode ter sido encerrado enquanto se esperava por espaço na fila
+		if self.__closed:
+			self.__drain()
+		return future
+
+
+	async def submit(self, op: str, **args):
+		"""Cliente em processo: executa um pedido e devolve o resultado (levanta RuntimeError se o pedido falhar)."""
+		return await (await self.enqueue(op, args))
+
+
+	async def __batch_loop(self) -> None:
+		"""Junta os pedidos em lotes de até 'batch_size', esperando no máximo 'batch_delay' segundos, e envia-os para os processos."""
+		loop = asyncio.get_running_loop()
+		batch = []
+		try:
+			while True:
+				batch = [await self.__queue.get()]
+				deadline = loop.time() + self.batch_delay
+				while len(batch) < self.batch_size:
+					timeout = deadline - loop.time()
+					if timeout <= 0:
+						break
+					try:
+						batch.append(await asyncio.wait_for(self.__queue.get(), timeout))
+					except asyncio.TimeoutError:
+						break
+				await self.__inflight.acquire()
+				task = loop.create_task(self.__dispatch(batch))
+				self.__pending.add(task)
+				task.add_done_callback(self.__pending.discard)
+				batch = []
+		except asyncio.CancelledError:
+			# pedidos já retirados da fila mas ainda não enviados para os processos
+			self.__fail(batch)
+			raise
+
+
+	def __drain(self) -> None:
+		"""Retira da fila e faz falhar todos os pedidos que lá se encontram."""
+		while not self.__queue.empty():
+			self.__fail([self.__queue.get_nowait()])
+
+
+	def __fail(self, items: list) -> None:
+		"""Faz falhar, com RuntimeError, os pedidos ainda não resolvidos (serviço encerrado)."""
+		for op,args,future,start in items:
+			if not future.done():
+				self.__counts["errors"] += 1
+				future.set_exception(RuntimeError("O serviço foi encerrado antes de executar o pedido."))
+
+
+	async def __dispatch(self, batch: list) -> None:
+		"""Executa um lote no conjunto de processos e resolve os futures de cada pedido."""
+		try:
+			jobs = [(op, args) for op,args,future,start in batch]
+			try:
+				results = await asyncio.get_running_loop().run_in_executor(self.__executor, _run_batch, jobs)
+			except Exception as err:
+				results = [(False, f"{type(err).__name__}: {err}")] * len(batch)
+			self.__counts["batches"] += 1
+			for (op,args,future,start),(ok,result) in zip(batch, results):
+				self.latencies.append(time.perf_counter() - start)
+				self.__counts["requests"] += 1
+				if future.done():
+					continue
+				if ok:
+					future.set_result(result)
+				else:
+					self.__counts["errors"] += 1
+					future.set_exception(RuntimeError(result))
+		finally:
+			self.__inflight.release()
+
+
+	def stats(self) -> dict:
+		"""Devolve o número de pedidos, erros e lotes, o tamanho da fila e a latência por pedido (média, p50, p95 e máximo, em ms)."""
+		stats = dict(self.__counts)
+		stats["queued"] = self.__queue.qsize() if self.__queue is not None else 0
+		lat = sorted(self.latencies)
+		if lat:
+			stats["latency_ms"] = {"mean": 1000 * sum(lat) / len(lat), "p50": 1000 * lat[len(lat) // 2],
+								   "p95": 1000 * lat[min(len(lat) - 1, int(0.95 * len(lat)))], "max": 1000 * lat[-1]}
+		return stats
+
+
+	async def __handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+		"""Atende uma ligação: cada linha é um pedido JSON {"id", "op", "args"} e cada resposta é uma linha JSON {"id", "ok", "result"/"error", "latency_ms"}."""
+		lock = asyncio.Lock()
+		tasks = set()
+
+		async def reply(req_id, future, start) -> None:
+			try:
+				msg = {"id": req_id, "ok": True, "result": await future}
+			except Exception as err:
+				msg = {"id": req_id, "ok": False, "error": str(err)}
+			msg["latency_ms"] = 1000 * (time.perf_counter() - start)
+			async with lock:
+				writer.write((json.dumps(msg) + "\n").encode())
+				await writer.drain()
+
+		try:
+			while line := await reader.readline():
+				start = time.perf_counter()
+				req = None
+				try:
+					req = json.loads(line)
+					future = await self.enqueue(req["op"], req.get("args", {}))
+				except Exception as err:
+					future = asyncio.get_running_loop().create_future()
+					future.set_exception(ValueError(f"Pedido inválido: {err}"))
+					req = req if type(req) == dict else {}
+				task = asyncio.get_running_loop().create_task(reply(req.get("id"), future, start))
+				tasks.add(task)
+				task.add_done_callback(tasks.discard)
+			if tasks:
+				await asyncio.gather(*tasks)
+		finally:
+			writer.close()
+
+
+	async def serve_unix(self, path: str) -> asyncio.AbstractServer:
+		"""Aceita ligações num socket Unix."""
+		return await asyncio.start_unix_server(self.__handle, path)
+
+
+	async def serve_tcp(self, host = "127.0.0.1", port = 0) -> asyncio.AbstractServer:
+		"""Aceita ligações TCP (por defeito apenas em localhost)."""
+		return await asyncio.start_server(self.__handle, host, port)
+
+
+class ServiceClient:
+	"""Cliente assíncrono para o AlignService, através de um socket Unix ou de uma ligação TCP local."""
+
+	def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+		self.reader = reader
+		self.writer = writer
+		self.__next_id = 0
+		self.__waiting = {}
+		self.__receiver = asyncio.get_running_loop().create_task(self.__receive())
+
+
+	@classmethod
+	async def connect_unix(cls, path: str) -> "ServiceClient":
+		return cls(*await asyncio.open_unix_connection(path))
+
+
+	@classmethod
+	async def connect_tcp(cls, host = "127.0.0.1", port = 8765) -> "ServiceClient":
+		return cls(*await asyncio.open_connection(host, port))
+
+
+	async def __receive(self) -> None:
+		"""Lê as respostas do serviço e entrega cada uma ao pedido com o mesmo 'id'."""
+		try:
+			while line := await self.reader.readline():
+				msg = json.loads(line)
+				future = self.__waiting.pop(msg["id"], None)
+				if future is not None and not future.done():
+					future.set_result(msg)
+		finally:
+			for future in self.__waiting.values():
+				if not future.done():
+					future.set_exception(ConnectionError("A ligação ao serviço foi fechada."))
+
+
+	async def request(self, op: str, **args):
+		"""Envia um pedido e devolve o resultado (levanta RuntimeError se o pedido falhar)."""
+		self.__next_id += 1
+		req_id = self.__next_id
+		future = asyncio.get_running_loop().create_future()
+		self.__waiting[req_id] = future
+		self.writer.write((json.dumps({"id": req_id, "op": op, "args": args}) + "\n").encode())
+		await self.writer.drain()
+		msg = await future
+		if not msg["ok"]:
+			raise RuntimeError(msg["error"])
+		return msg["result"]
+
+
+	async def close(self) -> None:
+		self.writer.close()
+		await self.writer.wait_closed()
+		self.__receiver.cancel()
+
+
+
+if __name__ == "__main__":
+
+	parser = argparse.ArgumentParser(description = "Serviço local de alinhamentos e pesquisas (BLAST, motifs).")
+	parser.add_argument("--unix", default = None, help = "caminho do socket Unix (por defeito usa TCP em localhost)")
+	parser.add_argument("--port", type = int, default = 8765)
+	parser.add_argument("--processes", type = int, default = None)
+	parser.add_argument("--subject", nargs = 2, action = "append", default = [], metavar = ("NOME","FICHEIRO"),
+						help = "regista uma sequência sujeito (ficheiro só com a sequência)")
+	args = parser.parse_args()
+
+	subjects = {}
+	for name,path in args.subject:
+		with open(path) as file:
+			subjects[name] = "".join(file.read().split())
+	unix = os.path.abspath(args.unix) if args.unix else None
+	# os ficheiros blosum são lidos a partir da diretoria corrente
+	os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+	async def main() -> None:
+		async with AlignService(subjects, args.processes) as service:
+			server = await (service.serve_unix(unix) if unix else service.serve_tcp("127.0.0.1", args.port))
+			async with server:
+				await server.serve_forever()
+
+	asyncio.run(main())